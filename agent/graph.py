@@ -11,6 +11,7 @@ from agent.state import AgentState
 from agent.prompting import get_system_prompt
 from agent.validation import validate_sql, generate_repair_prompt
 from tools.execute_sql import execute_sql_query
+from database.materialization import record_query, refresh_materialized_views
 from tools.plot import generate_plot_config
 
 # Load Environment
@@ -54,6 +55,14 @@ def execute_node(state: AgentState):
     result = execute_sql_query(sql)
     if isinstance(result, str) and result.startswith("Error:"):
         return {"sql_error": result}
+
+    # Learn the workload: once a rollup shape repeats enough, precompute it
+    try:
+        if record_query(sql):
+            refresh_materialized_views()
+    except Exception as e:
+        print(f"Rollup materialization failed: {e}")
+
     return {"query_result": result, "sql_error": None}
 
 def repair_node(state: AgentState):
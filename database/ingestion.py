@@ -2,6 +2,7 @@ import pandas as pd
 import os
 from sqlalchemy import text
 from database.connection import get_db_engine, DB_NAME
+from database.materialization import refresh_materialized_views, invalidate_schema_cache
 
 def sanitize_column_name(col_name: str) -> str:
     return (
@@ -65,4 +66,12 @@ def ingest_directory(directory_path: str, reset_db: bool = False):
         except Exception as e:
             print(f"   ❌ Failed to load {file}: {e}")
 
+    # 3. Rebuild workload rollups against the freshly loaded base tables
+    invalidate_schema_cache()
+    if loaded_tables:
+        try:
+            refresh_materialized_views(force=True)
+        except Exception as e:
+            print(f"⚠️ Could not rebuild rollup tables: {e}")
+
     return loaded_tables
\ No newline at end of file
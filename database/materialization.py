@@ -0,0 +1,653 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from sqlalchemy import inspect, text
+from database.connection import get_db_engine
+
+# Workload log lives outside the .db file so it survives "Reset & Reload"
+WORKLOAD_LOG = "query_workload.jsonl"
+MAX_LOG_ENTRIES = 500       # Only the recent workload decides what gets materialized
+MIN_SHAPE_COUNT = 3         # A GROUP BY shape must repeat this often to earn a rollup
+MAX_ROLLUPS = 10            # Keep the schema prompt small
+
+ROLLUP_PREFIX = "agg_"
+CATALOG_TABLE = "_rollup_catalog"
+
+AGGREGATE_FUNCS = ("SUM", "COUNT", "MIN", "MAX", "AVG")
+
+SQL_KEYWORDS = {
+    "on", "join", "inner", "left", "right", "full", "outer", "cross", "natural", "using", "where"
+}
+
+SHAPE_PATTERN = re.compile(
+    r"^SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<from>.+?)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"\s+GROUP\s+BY\s+(?P<group>.+?)"
+    r"(?:\s+HAVING\s+.+?)?"
+    r"(?:\s+ORDER\s+BY\s+.+?)?"
+    r"(?:\s+LIMIT\s+.+?)?\s*;?$",
+    re.IGNORECASE | re.DOTALL,
+)
+
+TABLE_REF_PATTERN = re.compile(
+    r"(?:^|(?<=\bJOIN ))([A-Za-z_]\w*)"
+    r"(?:\s+(?:AS\s+)?(?!(?:" + "|".join(SQL_KEYWORDS) + r")\b)([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+COLUMN_REF_PATTERN = re.compile(r"\b(?:([a-z_]\w*)\.)?([a-z_]\w*)\b(?!\s*\()")
+
+# --- PARSING ---
+
+def sub_outside_literals(pattern, repl, expr: str) -> str:
+    """re.sub that leaves quoted string literals untouched."""
+    parts, last = [], 0
+    for literal in LITERAL_PATTERN.finditer(expr):
+        parts.append(re.sub(pattern, repl, expr[last:literal.start()]))
+        parts.append(literal.group(0))
+        last = literal.end()
+    parts.append(re.sub(pattern, repl, expr[last:]))
+    return "".join(parts)
+
+def canonical_case(expr: str) -> str:
+    """Lowercases identifiers and keywords; '%Y' and '%y' stay different."""
+    return sub_outside_literals(r"[^']+", lambda m: m.group(0).lower(), expr)
+
+def split_top_level(clause: str):
+    """Splits a comma-separated clause, ignoring commas inside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in clause:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+def to_column_name(expr: str) -> str:
+    """'SUM(sales.total_amount)' -> 'sum_total_amount'"""
+    name = re.sub(r"\b[A-Za-z_]\w*\.", "", expr.lower())
+    name = name.replace("(*)", "(all)").replace("*", " x ")
+    name = re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+    return name[:48] or "col"
+
+def canonicalize_from(from_clause: str):
+    """
+    Rewrites table aliases to real table names so that 'sales s' and 'sales AS t'
+    produce the same shape. Returns (from_clause, tables, alias_map) or None.
+    Only explicit 'JOIN ... ON/USING' joins are accepted: a comma join keeps its
+    join condition in WHERE, which the rollup would otherwise lose.
+    """
+    if len(split_top_level(from_clause)) != 1:
+        return None
+    if re.search(r"\b(cross|natural)\b", from_clause):
+        return None
+    if len(re.findall(r"\bjoin\b", from_clause)) != len(re.findall(r"\b(?:on|using)\b", from_clause)):
+        return None
+
+    tables, alias_map = [], {}
+    for table, alias in TABLE_REF_PATTERN.findall(from_clause):
+        tables.append(table)
+        if alias:
+            alias_map[alias] = table
+
+    # Self-joins cannot be de-aliased safely
+    if not tables or len(set(tables)) != len(tables):
+        return None
+
+    canonical = TABLE_REF_PATTERN.sub(lambda m: m.group(1), from_clause)
+    return canonical, tables, alias_map
+
+def qualify(expr: str, alias_map: dict, single_table: bool) -> str:
+    """Replaces alias qualifiers with table names (or drops them for single-table queries)."""
+    def repl(match):
+        if single_table:
+            return ""
+        return f"{alias_map.get(match.group(1), match.group(1))}."
+    return sub_outside_literals(r"\b([a-z_]\w*)\.(?=[a-z_\"])", repl, expr)
+
+def normalize(expr: str) -> str:
+    return re.sub(r"\s+", " ", expr).strip()
+
+def parse_select_item(item: str):
+    """Splits 'SUM(x) AS total' into ('SUM(x)', 'total')."""
+    match = re.match(r"^(.*?)\s+(?:AS\s+)?([A-Za-z_]\w*)$", item, re.IGNORECASE | re.DOTALL)
+    if match and not match.group(1).rstrip().endswith((".", "(")):
+        return match.group(1).strip(), match.group(2)
+    return item.strip(), None
+
+def parse_aggregate(expr: str):
+    """Returns (FUNC, argument) when the whole expression is a single aggregate call."""
+    match = re.match(r"^(\w+)\s*\((.*)\)$", expr, re.DOTALL)
+    if not match or match.group(1).upper() not in AGGREGATE_FUNCS:
+        return None
+    # DISTINCT aggregates can't be re-aggregated from a rollup
+    if re.match(r"\s*DISTINCT\b", match.group(2), re.IGNORECASE):
+        return None
+    # Reject things like 'SUM(a) / COUNT(b)' where the outer parens don't pair up
+    depth = 0
+    for char in match.group(2):
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if depth < 0:
+            return None
+    return match.group(1).upper(), normalize(match.group(2))
+
+def resolve_column(qualifier, column, tables, alias_map, table_columns):
+    """
+    Maps a column reference to (table, column). Returns None for tokens that are
+    not columns (keywords, function names) and raises ValueError when ambiguous.
+    """
+    if qualifier:
+        table = alias_map.get(qualifier, qualifier)
+        if table not in tables or column not in table_columns[table]:
+            raise ValueError(f"Unknown column {qualifier}.{column}")
+        return table, column
+    owners = [t for t in tables if column in table_columns[t]]
+    if len(owners) > 1:
+        raise ValueError(f"Ambiguous column {column}")
+    return (owners[0], column) if owners else None
+
+def referenced_columns(expr, tables, alias_map, table_columns):
+    """(table, column) pairs referenced by an expression, ignoring string literals."""
+    stripped = LITERAL_PATTERN.sub("''", expr)
+    columns = set()
+    for qualifier, column in COLUMN_REF_PATTERN.findall(stripped):
+        resolved = resolve_column(qualifier, column, tables, alias_map, table_columns)
+        if resolved:
+            columns.add(resolved)
+    return columns
+
+def qualify_columns(expr, tables, alias_map, table_columns):
+    """Prefixes bare column names with their owning table ('name' -> 'customers.name')."""
+    def repl(match):
+        if match.group(1):
+            return match.group(0)
+        resolved = resolve_column(None, match.group(2), tables, alias_map, table_columns)
+        return f"{resolved[0]}.{resolved[1]}" if resolved else match.group(0)
+    return sub_outside_literals(COLUMN_REF_PATTERN, repl, expr)
+
+def extract_shape(sql: str, table_columns: dict):
+    """
+    Reduces a GROUP BY query to a reusable rollup shape:
+    {tables, from_clause, group_by: [expr], aggregates: [(func, arg)]}.
+    table_columns maps each loaded base table to its column names; queries on
+    anything else (rollups, the catalog, tables not loaded) are not shapes.
+    HAVING/ORDER BY/LIMIT are ignored - the rollup keeps the full grain. WHERE is
+    only ignored when it filters grouped columns of a single table, since the
+    rollup still holds every group then.
+    Returns None for anything we can't rewrite safely (subqueries, DISTINCT, UNION...).
+    """
+    sql = canonical_case(normalize(sql))
+    if len(re.findall(r"\bselect\b", sql)) != 1:
+        return None
+    if re.search(r"\b(union|intersect|except|with)\b", sql):
+        return None
+
+    match = SHAPE_PATTERN.match(sql)
+    if not match or re.match(r"distinct\b", match.group("select")):
+        return None
+
+    canonical = canonicalize_from(match.group("from"))
+    if canonical is None:
+        return None
+    from_clause, tables, alias_map = canonical
+    if any(t not in table_columns for t in tables):
+        return None
+
+    single_table = len(tables) == 1
+    if single_table:
+        from_clause = tables[0]
+    else:
+        from_clause = qualify(from_clause, alias_map, single_table=False)
+
+    def canonical_expr(expr):
+        # In joins every column gets its table prefix, so 'name' and 'c.name' match
+        expr = qualify(expr, alias_map, single_table)
+        if single_table:
+            return expr
+        return qualify_columns(expr, tables, alias_map, table_columns)
+
+    try:
+        if not single_table:
+            from_clause = re.sub(
+                r"(\bon\s+)(.*?)(?=\s+(?:(?:inner|left|right|full|outer)\s+)*join\b|$)",
+                lambda m: m.group(1) + qualify_columns(m.group(2), tables, alias_map, table_columns),
+                from_clause,
+            )
+
+        select_items = []
+        for item in split_top_level(match.group("select")):
+            expr, alias = parse_select_item(item)
+            select_items.append((canonical_expr(expr), alias))
+
+        # Resolve GROUP BY ordinals ('GROUP BY 1') and select-list aliases. Like SQLite,
+        # a name that is also a source column binds to the column, not the alias.
+        aliases = {alias: expr for expr, alias in select_items if alias}
+        source_columns = set().union(*(table_columns[t] for t in tables))
+        group_exprs = []
+        for item in split_top_level(match.group("group")):
+            if item.isdigit():
+                index = int(item) - 1
+                if not 0 <= index < len(select_items):
+                    return None
+                group_exprs.append(select_items[index][0])
+            elif item in aliases and item not in source_columns:
+                group_exprs.append(aliases[item])
+            else:
+                group_exprs.append(canonical_expr(item))
+
+        where = match.group("where")
+        if where:
+            filtered = referenced_columns(where, tables, alias_map, table_columns)
+            grouped = set()
+            for expr in group_exprs:
+                refs = referenced_columns(expr, tables, alias_map, table_columns)
+                plain = re.fullmatch(r"(?:[a-z_]\w*\.)?[a-z_]\w*", expr)
+                if plain and len(refs) == 1:
+                    grouped |= refs
+            if len({table for table, _ in filtered}) > 1 or not filtered <= grouped:
+                return None
+    except ValueError:
+        return None
+
+    group_keys = set(group_exprs)
+    aggregates = set()
+    for expr, _ in select_items:
+        aggregate = parse_aggregate(expr)
+        if aggregate:
+            aggregates.add(aggregate)
+        elif expr not in group_keys:
+            # Bare non-grouped column (or DISTINCT aggregate): not a clean rollup shape
+            return None
+
+    if not aggregates:
+        return None
+
+    return {
+        "tables": tables,
+        "from_clause": normalize(from_clause),
+        "group_by": sorted(group_keys),
+        "aggregates": sorted(aggregates),
+    }
+
+def shape_key(shape: dict) -> str:
+    return shape["from_clause"] + " | " + ", ".join(shape["group_by"])
+
+# --- WORKLOAD LOG ---
+
+_log_lock = threading.Lock()
+_shape_stats = None     # shape key -> {"count": int, "aggregates": set}, built lazily
+_logged_entries = 0     # Lines in the log file since the last trim
+_schema_cache = None    # {"table_columns", "rollups"}; cleared on refresh and ingest
+
+def get_rollup_names(engine):
+    if CATALOG_TABLE not in inspect(engine).get_table_names():
+        return set()
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text(f"SELECT name FROM {CATALOG_TABLE}"))}
+
+def get_internal_tables(engine):
+    """Rollups and the catalog are listed separately from the user's own tables."""
+    return get_rollup_names(engine) | {CATALOG_TABLE}
+
+def get_base_table_columns(engine, internal_tables=None):
+    """Maps every user table (not rollups) to its lower-cased column names."""
+    inspector = inspect(engine)
+    internal = get_internal_tables(engine) if internal_tables is None else internal_tables
+    return {
+        table.lower(): {col["name"].lower() for col in inspector.get_columns(table)}
+        for table in inspector.get_table_names()
+        if table not in internal
+    }
+
+def shape_from_json(data: dict):
+    """JSON turns aggregate tuples into lists; turn them back."""
+    return {**data, "aggregates": sorted(tuple(a) for a in data["aggregates"])}
+
+def load_rollup_shapes(engine):
+    """Catalog entries as {name: {"shape", "hits"}}."""
+    if CATALOG_TABLE not in inspect(engine).get_table_names():
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT name, shape, hits FROM {CATALOG_TABLE}"))
+        return {row.name: {"shape": shape_from_json(json.loads(row.shape)), "hits": row.hits} for row in rows}
+
+def get_schema_cache():
+    """
+    Base-table columns and built rollups, read once and reused by every query.
+    Only refresh_materialized_views and ingestion change either, and both clear it.
+    """
+    global _schema_cache
+    if _schema_cache is None:
+        engine = get_db_engine()
+        rollups = load_rollup_shapes(engine)
+        _schema_cache = {
+            "table_columns": get_base_table_columns(engine, set(rollups) | {CATALOG_TABLE}),
+            "rollups": rollups,
+        }
+    return _schema_cache
+
+def invalidate_schema_cache():
+    global _schema_cache
+    _schema_cache = None
+
+def rollup_references(sql: str, rollup_names):
+    """Names of rollup tables a query reads from."""
+    identifiers = set(re.findall(r"\b[a-z_]\w*\b", LITERAL_PATTERN.sub("''", sql.lower())))
+    return identifiers & set(rollup_names)
+
+def entry_shapes(entry: dict, table_columns: dict):
+    """
+    Shapes a log entry counts toward: its own GROUP BY shape, plus the shape
+    behind every rollup it read. Rollup reads therefore keep a rollup alive
+    after the base queries that created it have aged out of the window.
+    """
+    shapes = []
+    shape = extract_shape(entry["sql"], table_columns)
+    if shape:
+        shapes.append(shape)
+    for data in (entry.get("rollup_shapes") or {}).values():
+        rollup_shape = shape_from_json(data)
+        if all(t in table_columns for t in rollup_shape["tables"]):
+            shapes.append(rollup_shape)
+    return shapes
+
+def load_workload():
+    """Last MAX_LOG_ENTRIES log entries as {"sql", "shape", "rollup_shapes"} dicts."""
+    if not os.path.exists(WORKLOAD_LOG):
+        return []
+    entries = []
+    with open(WORKLOAD_LOG, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                entry["sql"]
+            except (ValueError, KeyError, TypeError):
+                continue  # Skip torn or foreign lines
+            entries.append(entry)
+    return entries[-MAX_LOG_ENTRIES:]
+
+def count_shape(shape_stats: dict, shape: dict):
+    stats = shape_stats.setdefault(shape_key(shape), {"count": 0, "aggregates": set()})
+    stats["count"] += 1
+    stats["aggregates"].update(shape["aggregates"])
+    return stats
+
+def load_shape_stats(table_columns):
+    global _shape_stats, _logged_entries
+    if _shape_stats is None:
+        _shape_stats = {}
+        entries = load_workload()
+        _logged_entries = len(entries)
+        for entry in entries:
+            for shape in entry_shapes(entry, table_columns):
+                count_shape(_shape_stats, shape)
+    return _shape_stats
+
+def trim_workload():
+    """Keeps the newest MAX_LOG_ENTRIES lines; the swap is atomic so readers never see a torn file."""
+    global _shape_stats, _logged_entries
+    entries = load_workload()
+    temp_path = f"{WORKLOAD_LOG}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(temp_path, WORKLOAD_LOG)
+    _shape_stats, _logged_entries = None, len(entries)
+
+def needs_rollup_refresh(shape: dict, count: int, rollups: dict) -> bool:
+    """A frequent shape needs a refresh if its rollup is missing or lacks an asked-for aggregate."""
+    if count < MIN_SHAPE_COUNT:
+        return False
+    built = rollups.get(rollup_name(shape))
+    if built is None:
+        # With the catalog full, only a shape that would displace a rollup is worth a refresh
+        return len(rollups) < MAX_ROLLUPS or count > min(r["hits"] for r in rollups.values())
+    return not set(shape["aggregates"]) <= set(built["shape"]["aggregates"])
+
+def record_query(sql: str) -> bool:
+    """
+    Appends a successfully executed query to the workload log.
+    Queries that read a rollup are logged too, with the rollup's shape, so a
+    rollup in use keeps its hits.
+    Returns True when a frequent shape has no rollup yet, or its rollup is
+    missing an aggregate this query asked for.
+    """
+    # Cheap bail-out before any schema lookup: only GROUP BYs and rollup reads matter
+    lowered = sql.lower()
+    if not re.search(r"\bgroup\s+by\b", lowered) and ROLLUP_PREFIX not in lowered:
+        return False
+
+    cache = get_schema_cache()
+    table_columns, rollups = cache["table_columns"], cache["rollups"]
+    shape = extract_shape(sql, table_columns)
+    rollup_shapes = {name: rollups[name]["shape"] for name in sorted(rollup_references(sql, rollups))}
+    if shape is None and not rollup_shapes:
+        return False
+
+    entry = {"sql": sql, "shape": shape_key(shape) if shape else None, "rollup_shapes": rollup_shapes}
+    with _log_lock:
+        shape_stats = load_shape_stats(table_columns)
+        try:
+            # One short append per query: concurrent sessions interleave lines, not bytes
+            with open(WORKLOAD_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write workload log: {e}")
+            return False
+
+        global _logged_entries
+        _logged_entries += 1
+        needs_refresh = False
+        for counted in entry_shapes(entry, table_columns):
+            stats = count_shape(shape_stats, counted)
+            needs_refresh |= needs_rollup_refresh(counted, stats["count"], rollups)
+
+        if _logged_entries > 2 * MAX_LOG_ENTRIES:
+            try:
+                trim_workload()
+            except OSError as e:
+                print(f"⚠️ Could not trim workload log: {e}")
+
+    return needs_refresh
+
+def detect_frequent_shapes(table_columns: dict, min_count: int = MIN_SHAPE_COUNT, limit: int = MAX_ROLLUPS):
+    """
+    Groups the logged queries by shape and merges the aggregates each shape was
+    asked for, so 'total sales by region' and 'average sale by region' share one rollup.
+    Reads of an existing rollup count as hits for the shape it was built from.
+    """
+    shapes, counts = {}, {}
+    for entry in load_workload():
+        for shape in entry_shapes(entry, table_columns):
+            key = shape_key(shape)
+            counts[key] = counts.get(key, 0) + 1
+            if key not in shapes:
+                shapes[key] = dict(shape)
+            else:
+                shapes[key]["aggregates"] = sorted(set(shapes[key]["aggregates"]) | set(shape["aggregates"]))
+
+    specs = [build_rollup_spec(shapes[key], counts[key]) for key in shapes if counts[key] >= min_count]
+    specs.sort(key=lambda spec: spec["hits"], reverse=True)
+    return specs[:limit]
+
+def rollup_name(shape: dict) -> str:
+    """Derived only from tables and canonical group expressions, so it is stable."""
+    used, group_names = set(), []
+    for expr in shape["group_by"]:
+        name, i = to_column_name(expr), 2
+        base = name
+        while name in used:
+            name = f"{base}_{i}"
+            i += 1
+        used.add(name)
+        group_names.append(name)
+    readable = f"{ROLLUP_PREFIX}{'_'.join(shape['tables'])}_by_{'_'.join(group_names)}"[:56]
+    digest = hashlib.md5(shape_key(shape).encode()).hexdigest()[:6]
+    return f"{readable}_{digest}"
+
+def build_rollup_spec(shape: dict, hits: int):
+    """
+    Turns a shape into a CREATE-able SELECT plus a column glossary for the prompt.
+    Table and column names come from the canonical expressions, never from a
+    user's alias, so they stay stable as the workload window slides.
+    """
+    columns, select_parts, used = [], [], set()
+
+    def claim(name):
+        base, i = name, 2
+        while name in used:
+            name = f"{base}_{i}"
+            i += 1
+        used.add(name)
+        return name
+
+    for expr in shape["group_by"]:
+        name = claim(to_column_name(expr))
+        select_parts.append(f"{expr} AS {name}")
+        columns.append((name, expr))
+
+    for func, arg in shape["aggregates"]:
+        # AVG is stored as SUM + COUNT so it can be re-aggregated to a coarser grain
+        # (as 1.0 * SUM / COUNT - INTEGER columns would otherwise divide as integers)
+        parts = [("SUM", arg), ("COUNT", arg)] if func == "AVG" else [(func, arg)]
+        for part_func, part_arg in parts:
+            expr = f"{part_func}({part_arg})"
+            if any(existing == expr for _, existing in columns):
+                continue
+            name = claim(to_column_name(expr))
+            select_parts.append(f"{expr} AS {name}")
+            columns.append((name, expr))
+
+    definition = (
+        f"SELECT {', '.join(select_parts)} FROM {shape['from_clause']} "
+        f"GROUP BY {', '.join(shape['group_by'])}"
+    )
+    return {
+        "name": rollup_name(shape),
+        "definition": definition,
+        "shape": shape,
+        "tables": shape["tables"],
+        "columns": columns,
+        "hits": hits,
+    }
+
+# --- BUILD / REFRESH ---
+
+def table_fingerprint(conn, tables):
+    """Cheap change detector for base tables: row count + max rowid."""
+    fingerprint = {}
+    for table in tables:
+        row = conn.execute(text(f"SELECT COUNT(*), MAX(rowid) FROM {table}")).fetchone()
+        fingerprint[table] = [row[0], row[1]]
+    return fingerprint
+
+def ensure_catalog(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} ("
+        "name TEXT PRIMARY KEY, definition TEXT, base_tables TEXT, "
+        "columns TEXT, shape TEXT, fingerprint TEXT, hits INTEGER)"
+    ))
+
+def refresh_materialized_views(force: bool = False):
+    """
+    Builds rollups for frequent workload shapes and rebuilds any whose base
+    tables changed. Rollups that are no longer frequent are dropped.
+    force=True rebuilds everything (used after ingestion replaces base tables).
+    Returns the list of rollup table names that were (re)built.
+    """
+    global _shape_stats
+    invalidate_schema_cache()
+    if force:
+        _shape_stats = None  # Base tables were replaced; re-derive shape counts lazily
+
+    engine = get_db_engine()
+    specs = detect_frequent_shapes(get_base_table_columns(engine))
+    existing_tables = set(inspect(engine).get_table_names())
+    rebuilt = []
+
+    with engine.begin() as conn:
+        ensure_catalog(conn)
+        catalog = {
+            row.name: row for row in conn.execute(
+                text(f"SELECT name, definition, fingerprint FROM {CATALOG_TABLE}")
+            )
+        }
+
+        wanted = {spec["name"] for spec in specs}
+        for name in catalog:
+            if name not in wanted:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE name = :name"), {"name": name})
+
+        for spec in specs:
+            try:
+                fingerprint = json.dumps(table_fingerprint(conn, spec["tables"]))
+                current = catalog.get(spec["name"])
+                is_fresh = (
+                    current is not None
+                    and spec["name"] in existing_tables
+                    and current.definition == spec["definition"]
+                    and current.fingerprint == fingerprint
+                )
+                if is_fresh and not force:
+                    conn.execute(
+                        text(f"UPDATE {CATALOG_TABLE} SET hits = :hits WHERE name = :name"),
+                        {"hits": spec["hits"], "name": spec["name"]},
+                    )
+                    continue
+
+                conn.execute(text(f"DROP TABLE IF EXISTS {spec['name']}"))
+                conn.execute(text(f"CREATE TABLE {spec['name']} AS {spec['definition']}"))
+                conn.execute(
+                    text(
+                        f"INSERT OR REPLACE INTO {CATALOG_TABLE} "
+                        "(name, definition, base_tables, columns, shape, fingerprint, hits) "
+                        "VALUES (:name, :definition, :base_tables, :columns, :shape, :fingerprint, :hits)"
+                    ),
+                    {
+                        "name": spec["name"],
+                        "definition": spec["definition"],
+                        "base_tables": json.dumps(spec["tables"]),
+                        "columns": json.dumps(spec["columns"]),
+                        "shape": json.dumps(spec["shape"]),
+                        "fingerprint": fingerprint,
+                        "hits": spec["hits"],
+                    },
+                )
+                rebuilt.append(spec["name"])
+            except Exception as e:
+                # Never advertise a rollup we couldn't (re)build
+                conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE name = :name"), {"name": spec["name"]})
+                print(f"   ❌ Failed to build rollup '{spec['name']}': {e}")
+
+    invalidate_schema_cache()
+    if rebuilt:
+        print(f"📊 Materialized {len(rebuilt)} rollup table(s): {', '.join(rebuilt)}")
+    return rebuilt
+
+def get_rollup_catalog(engine):
+    """Returns catalog rows for the schema prompt (empty if nothing is materialized)."""
+    if CATALOG_TABLE not in inspect(engine).get_table_names():
+        return []
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            f"SELECT name, definition, base_tables, columns FROM {CATALOG_TABLE} ORDER BY hits DESC"
+        ))
+        return [
+            {
+                "name": row.name,
+                "definition": row.definition,
+                "tables": json.loads(row.base_tables),
+                "columns": json.loads(row.columns),
+            }
+            for row in rows
+        ]
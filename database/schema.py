@@ -1,5 +1,6 @@
 from sqlalchemy import inspect, text
 from database.connection import get_db_engine
+from database.materialization import get_rollup_catalog, get_internal_tables
 
 def get_table_samples(engine, table_name, limit=3):
     with engine.connect() as conn:
@@ -48,7 +49,8 @@ def infer_relationships(inspector, table_names):
 def get_database_schema_string():
     engine = get_db_engine()
     inspector = inspect(engine)
-    table_names = inspector.get_table_names()
+    internal_tables = get_internal_tables(engine)
+    table_names = [t for t in inspector.get_table_names() if t not in internal_tables]
     
     schema_lines = []
     
@@ -73,5 +75,19 @@ def get_database_schema_string():
         schema_lines.append("--- Inferred Relationships (JOIN Hints) ---")
         for rel in relationships:
             schema_lines.append(rel)
+
+    rollups = get_rollup_catalog(engine)
+    if rollups:
+        schema_lines.append("")
+        schema_lines.append("--- Pre-aggregated Summary Tables (prefer these over scanning base tables) ---")
+        for rollup in rollups:
+            schema_lines.append(f"Table: {rollup['name']} (rollup of {', '.join(rollup['tables'])})")
+            for name, expr in rollup["columns"]:
+                schema_lines.append(f"  {name} = {expr}")
+        schema_lines.append(
+            "Rows are at the grain of the grouped columns. To answer a coarser question, "
+            "re-aggregate with SUM over sum_/count_ columns (AVG = 1.0 * SUM(sum_x) / SUM(count_x)); "
+            "MIN/MAX re-aggregate with MIN/MAX."
+        )
     
     return "\n".join(schema_lines)
\ No newline at end of file
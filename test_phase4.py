@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from sqlalchemy import text
+
+import database.connection as connection
+import database.materialization as mz
+
+# Point the DB and workload log at a scratch directory
+tmp_dir = tempfile.mkdtemp()
+connection.DB_NAME = os.path.join(tmp_dir, "test_rollups.db")
+mz.WORKLOAD_LOG = os.path.join(tmp_dir, "query_workload.jsonl")
+
+from database.schema import get_database_schema_string
+
+failures = 0
+
+def check(label, condition):
+    global failures
+    if condition:
+        print(f"✅ {label}")
+    else:
+        failures += 1
+        print(f"❌ {label}")
+
+TABLE_COLUMNS = {
+    "sales": {"region", "cid", "amount", "order_date"},
+    "customers": {"id", "name", "region"},
+    "agg_monthly": {"month", "total"},
+}
+
+def key(sql):
+    shape = mz.extract_shape(sql, TABLE_COLUMNS)
+    return mz.shape_key(shape) if shape else None
+
+print("--- TEST 1: SHAPE EXTRACTION ---")
+base = key("SELECT region, SUM(amount) FROM sales GROUP BY region")
+check("Plain GROUP BY is a shape", base is not None)
+check("Alias and AS forms share a shape",
+      key("SELECT s.region, SUM(s.amount) FROM sales s GROUP BY s.region") == base
+      and key("select t.region as r, sum(t.amount) as total from sales as t group by r") == base)
+check("GROUP BY ordinal resolves", key("SELECT region, SUM(amount) FROM sales GROUP BY 1") == base)
+check("HAVING / ORDER BY / LIMIT ignored",
+      key("SELECT region, SUM(amount) AS t FROM sales GROUP BY region HAVING SUM(amount) > 5 ORDER BY t DESC LIMIT 3;") == base)
+check("WHERE on a grouped column keeps the shape",
+      key("SELECT region, SUM(amount) FROM sales WHERE region = 'North' GROUP BY region") == base)
+check("WHERE on a non-grouped column is rejected",
+      key("SELECT region, SUM(amount) FROM sales WHERE amount > 5 GROUP BY region") is None)
+
+join = "SELECT c.name, SUM(s.amount) FROM sales s JOIN customers c ON s.cid = c.id GROUP BY c.name"
+check("Explicit JOIN ... ON is a shape", key(join) is not None)
+check("Comma join is rejected",
+      key("SELECT c.name, SUM(s.amount) FROM sales s, customers c WHERE s.cid = c.id GROUP BY c.name") is None)
+check("Unqualified join columns match qualified ones",
+      key("SELECT name, SUM(amount) FROM sales s JOIN customers c ON cid = id GROUP BY name") == key(join))
+check("WHERE across two tables is rejected",
+      key(join.replace(" GROUP BY", " WHERE s.region = c.region GROUP BY")) is None)
+
+check("Alias shadowing a source column binds to the column",
+      key("SELECT UPPER(region) AS region, SUM(amount) FROM sales GROUP BY region") is None)
+check("Literal case is preserved",
+      key("SELECT strftime('%Y-%m', order_date), SUM(amount) FROM sales GROUP BY 1")
+      != key("SELECT strftime('%y-%m', order_date), SUM(amount) FROM sales GROUP BY 1"))
+check("Names come from expressions, not aliases",
+      mz.build_rollup_spec(mz.extract_shape("SELECT region AS r, SUM(amount) FROM sales GROUP BY r", TABLE_COLUMNS), 3)["name"]
+      .startswith("agg_sales_by_region_"))
+check("User table named agg_* is learnable",
+      key("SELECT month, SUM(total) FROM agg_monthly GROUP BY month") is not None)
+
+for rejected in [
+    "SELECT region, COUNT(DISTINCT cid) FROM sales GROUP BY region",
+    "SELECT region, SUM(amount) / COUNT(cid) FROM sales GROUP BY region",
+    "SELECT region, cid, SUM(amount) FROM sales GROUP BY region",
+    "SELECT region, SUM(amount) FROM (SELECT * FROM sales) GROUP BY region",
+    "SELECT * FROM sales",
+]:
+    check(f"Rejected: {rejected}", key(rejected) is None)
+
+print("\n--- TEST 2: ROLLUPS MATCH THE BASE TABLE ---")
+engine = connection.get_db_engine()
+with engine.begin() as conn:
+    conn.execute(text("CREATE TABLE sales (region TEXT, cid INTEGER, amount REAL, order_date TEXT)"))
+    conn.execute(text("CREATE TABLE customers (id INTEGER, name TEXT, region TEXT)"))
+    conn.execute(text("CREATE TABLE agg_monthly (month TEXT, total REAL)"))
+    conn.execute(text("INSERT INTO customers VALUES (1, 'a', 'North'), (2, 'b', 'South')"))
+    conn.execute(text(
+        "INSERT INTO sales VALUES ('North', 1, 1, '2024-01-03'), ('North', 1, 3, '2024-02-10'), "
+        "('South', 2, 2, '2024-01-20'), ('South', 1, 4, '2024-02-01'), ('North', 2, 5, '2024-02-15')"
+    ))
+
+def rows(sql):
+    with engine.connect() as conn:
+        return sorted(tuple(r) for r in conn.execute(text(sql)))
+
+by_name = "SELECT c.name, SUM(s.amount) AS total, AVG(s.amount) FROM sales s JOIN customers c ON s.cid = c.id GROUP BY c.name"
+by_month = "SELECT region, strftime('%Y-%m', order_date) AS month, SUM(amount) FROM sales GROUP BY region, month"
+triggers = [mz.record_query(sql) for sql in [by_name] * 3 + [by_month] * 3]
+check("Third repeat of a shape triggers a refresh", triggers == [False, False, True, False, False, True])
+
+built = mz.refresh_materialized_views()
+check("Two rollups built", len(built) == 2)
+name_rollup = next(n for n in built if "_by_name_" in n)
+month_rollup = next(n for n in built if "strftime" in n)
+month_col = mz.to_column_name("strftime('%Y-%m', order_date)")
+
+check("Join rollup matches the base query",
+      rows(f"SELECT name, sum_amount, 1.0 * sum_amount / count_amount FROM {name_rollup}")
+      == rows("SELECT c.name, SUM(s.amount), AVG(s.amount) FROM sales s JOIN customers c ON s.cid = c.id GROUP BY c.name"))
+check("Re-aggregated rollup matches a coarser base query",
+      rows(f"SELECT {month_col}, SUM(sum_amount) FROM {month_rollup} GROUP BY {month_col}")
+      == rows("SELECT strftime('%Y-%m', order_date), SUM(amount) FROM sales GROUP BY 1"))
+
+schema = get_database_schema_string()
+check("Rollups listed in the schema prompt", name_rollup in schema and "Pre-aggregated Summary Tables" in schema)
+check("User table agg_monthly still listed", "Table: agg_monthly\n" in schema)
+check("Catalog table hidden", mz.CATALOG_TABLE not in schema)
+
+print("\n--- TEST 3: REBUILD ON BASE TABLE CHANGE ---")
+check("Fresh rollups are not rebuilt", mz.refresh_materialized_views() == [])
+with engine.begin() as conn:
+    conn.execute(text("INSERT INTO sales VALUES ('South', 2, 10, '2024-03-01')"))
+check("Changed base table triggers rebuild", set(mz.refresh_materialized_views()) == {name_rollup, month_rollup})
+check("Rebuilt rollup matches the base table",
+      rows(f"SELECT region, SUM(sum_amount) FROM {month_rollup} GROUP BY region")
+      == rows("SELECT region, SUM(amount) FROM sales GROUP BY region"))
+
+print("\n--- TEST 4: AVG ON AN INTEGER COLUMN ---")
+with engine.begin() as conn:
+    conn.execute(text("CREATE TABLE orders (region TEXT, qty INTEGER)"))
+    conn.execute(text("INSERT INTO orders VALUES ('North', 1), ('North', 2), ('South', 3), ('South', 4)"))
+mz.invalidate_schema_cache()
+for _ in range(3):
+    mz.record_query("SELECT region, AVG(qty) FROM orders GROUP BY region")
+orders_rollup = next(n for n in mz.refresh_materialized_views() if n.startswith("agg_orders_"))
+check("Re-aggregated integer AVG matches the base table",
+      rows(f"SELECT 1.0 * SUM(sum_qty) / SUM(count_qty) FROM {orders_rollup}")
+      == rows("SELECT AVG(qty) FROM orders"))
+
+print("\n--- TEST 5: ROLLUP READS KEEP A ROLLUP ALIVE ---")
+mz.MAX_LOG_ENTRIES = 6
+for _ in range(6):
+    mz.record_query(f"SELECT name, sum_amount FROM {name_rollup}")
+check("Window holds only rollup reads", all(not e["shape"] for e in mz.load_workload()))
+built = mz.refresh_materialized_views(force=True)
+kept = mz.get_rollup_names(engine)
+check("Read rollup survives a forced refresh", name_rollup in built and name_rollup in kept)
+check("Unread rollup is evicted", month_rollup not in kept)
+month_shape = mz.extract_shape(by_month, mz.get_schema_cache()["table_columns"])
+check("Shape past the threshold without a rollup needs a refresh",
+      mz.needs_rollup_refresh(month_shape, mz.MIN_SHAPE_COUNT + 2, mz.get_schema_cache()["rollups"]))
+check("Evicted shape triggers a rebuild once frequent again",
+      [mz.record_query(by_month) for _ in range(3)] == [False, False, True])
+mz.refresh_materialized_views()
+check("Evicted rollup is rebuilt", month_rollup in mz.get_rollup_names(engine))
+
+engine.dispose()
+shutil.rmtree(tmp_dir, ignore_errors=True)
+
+print(f"\n{'✅ All checks passed' if failures == 0 else f'❌ {failures} check(s) failed'}")